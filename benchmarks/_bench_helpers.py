@@ -0,0 +1,32 @@
+"""Helpers shared by the benchmarks"""
+
+import importlib.machinery
+import importlib.util
+import sys
+from pathlib import Path
+from typing import Any, Iterable, List
+
+REPO_PATH = Path(__file__).resolve().parent.parent
+TOOLS_PATH = REPO_PATH / "sz_tools"
+
+
+def load_tool(tool_name: str) -> Any:
+    """Import one of the extensionless sz_tools scripts as a module"""
+    sys.path.insert(0, str(TOOLS_PATH))
+    loader = importlib.machinery.SourceFileLoader(tool_name, str(TOOLS_PATH / tool_name))
+    spec = importlib.util.spec_from_loader(tool_name, loader)
+    module = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+    loader.exec_module(module)
+
+    return module
+
+
+def read_test_records(data_globs: Iterable[str]) -> List[str]:
+    """The JSON records, one per line, of the repository's test data files matching the globs"""
+    records: List[str] = []
+    for data_glob in data_globs:
+        for data_file in sorted(REPO_PATH.glob(data_glob)):
+            with open(data_file, "r", encoding="utf-8-sig") as records_in:
+                records.extend(line.strip() for line in records_in if line.strip().startswith("{"))
+
+    return records
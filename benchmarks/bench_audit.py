@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+"""
+Benchmark sz_audit comparing two generated entity maps in memory, with the audit and with the statistic checker. The
+prior map has a fraction of the newer map's records moved to other entities and some records missing from each.
+
+Seconds, peak RSS and the memory used per record compared are reported for each mode. Each mode runs in its own process
+so peak RSS is for that run alone. The exit status is 1 if any mode uses more than --max-bytes-per-record, the default
+is what comparing 100M records on a 64 GB host allows.
+
+    python3 benchmarks/bench_audit.py
+    python3 benchmarks/bench_audit.py -n 5000000 -m checker --shuffled --max-bytes-per-record 400
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, List
+
+from _bench_helpers import load_tool
+
+AUDIT_MODES = ("audit", "checker")
+ENTITY_MAP_HEADERS = ["RESOLVED_ENTITY_ID", "RELATED_ENTITY_ID", "MATCH_LEVEL", "MATCH_KEY", "DATA_SOURCE", "RECORD_ID"]
+
+
+def write_entity_maps(work_path: Path, num_records: int, moved: float, shuffled: bool, seed: int) -> None:
+    """Write the newer and prior entity maps, with the rows of each entity together unless shuffled"""
+    rand = random.Random(seed)
+    newer_entities = [rand.randint(1, num_records // 3 + 1) for _ in range(num_records)]
+    prior_entities = [
+        rand.randint(1, num_records // 3 + 1) if rand.random() < moved else entity_id for entity_id in newer_entities
+    ]
+
+    for file_name, record_entities in (("newer.csv", newer_entities), ("prior.csv", prior_entities)):
+        rows: List[List[Any]] = [
+            [entity_id, 0, 1, "+NAME+DOB", f"DS{record_number % 3}", f"R{record_number}"]
+            for record_number, entity_id in enumerate(record_entities)
+            if rand.random() >= 0.01
+        ]
+        if shuffled:
+            rand.shuffle(rows)
+        else:
+            rows.sort(key=lambda row: row[0])
+        with open(work_path / file_name, "w", encoding="utf-8", newline="") as map_file:
+            csv_writer = csv.writer(map_file)
+            csv_writer.writerow(ENTITY_MAP_HEADERS)
+            csv_writer.writerows(rows)
+
+
+def peak_rss_bytes() -> int:
+    """Peak RSS of this process, ru_maxrss is kilobytes on Linux and bytes on macOS"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def run_audit(work_path: Path, mode: str, num_records: int) -> dict[str, Any]:
+    """Compare the entity maps with sz_audit, run in its own process"""
+    audit = load_tool("sz_audit")
+    start_rss = peak_rss_bytes()
+    start_time = time.perf_counter()
+
+    # The statistic checker prints its results
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "audit":
+            status = audit.audit(
+                str(work_path / "newer.csv"), str(work_path / "prior.csv"), str(work_path / "audit"), False
+            )
+        else:
+            status = audit.stat_checker(str(work_path / "newer.csv"), str(work_path / "prior.csv"))
+
+    elapsed = time.perf_counter() - start_time
+    used_bytes = peak_rss_bytes() - start_rss
+
+    return {
+        "mode": mode,
+        "status": status,
+        "elapsed": elapsed,
+        "peak_rss_mb": peak_rss_bytes() / 1_048_576,
+        "bytes_per_record": used_bytes / num_records,
+    }
+
+
+def main() -> None:
+    """main"""
+    arg_parser = argparse.ArgumentParser(description="Benchmark sz_audit comparing entity maps in memory")
+    arg_parser.add_argument("-n", "--num-records", default=1_000_000, type=int, help="records in each entity map")
+    arg_parser.add_argument("-m", "--modes", choices=AUDIT_MODES, default=list(AUDIT_MODES), nargs="+", help="modes")
+    arg_parser.add_argument("--moved", default=0.05, type=float, help="fraction of records in another prior entity")
+    arg_parser.add_argument("--shuffled", action="store_true", help="don't keep the rows of each entity together")
+    arg_parser.add_argument(
+        "--max-bytes-per-record",
+        default=640,
+        type=int,
+        help="memory each record compared may use, the exit status is 1 if a mode uses more",
+    )
+    arg_parser.add_argument("--seed", default=1, type=int, help="random seed for the entity maps")
+    cli_args = arg_parser.parse_args()
+
+    results: List[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_path = Path(work_dir)
+        # Spawn a process for the entity maps and for each run, a process starts with the peak RSS of its parent
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(1, mp_context=mp_context) as executor:
+            executor.submit(
+                write_entity_maps, work_path, cli_args.num_records, cli_args.moved, cli_args.shuffled, cli_args.seed
+            ).result()
+        print(
+            f"\n{cli_args.num_records:,} records, {cli_args.moved:.0%} moved, "
+            f"{'shuffled' if cli_args.shuffled else 'grouped'} rows\n"
+        )
+        print(f"{'Mode':>8} {'Seconds':>8} {'RSS MB':>8} {'Bytes/rec':>10}")
+
+        for mode in cli_args.modes:
+            with ProcessPoolExecutor(1, mp_context=mp_context) as executor:
+                result = executor.submit(run_audit, work_path, mode, cli_args.num_records).result()
+            results.append(result)
+            print(
+                f"{mode:>8} {result['elapsed']:>8,.1f} {result['peak_rss_mb']:>8,.1f} "
+                f"{result['bytes_per_record']:>10,.0f}"
+            )
+    print()
+
+    over = [result["mode"] for result in results if result["bytes_per_record"] > cli_args.max_bytes_per_record]
+    if over:
+        print(f"{', '.join(over)} used more than {cli_args.max_bytes_per_record:,} bytes per record\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
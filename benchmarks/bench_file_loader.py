@@ -0,0 +1,230 @@
+#! /usr/bin/env python3
+"""
+Benchmark sz_file_loader's own overhead by driving load_and_redo against a stand-in engine instead of a Senzing
+repository. The stand-in engine has configurable per call latency, error injection and redo queue depth. The data/sg_test_v4
+and data/truth record files are scaled up with new record IDs to make the file to load.
+
+Records per second, CPU per record and peak RSS are reported for each combination of thread count, batch size and
+shuffle mode. Each combination runs in its own process so peak RSS is for that run alone.
+
+Requires the Senzing Python SDK to be importable, as sz_file_loader is imported to use its functions.
+
+    python3 benchmarks/bench_file_loader.py
+    python3 benchmarks/bench_file_loader.py -s 50 -t 4 16 64 -b 1 10 100 -m none stream file -l 0.5 -e 0.001
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, List
+
+from _bench_helpers import load_tool, read_test_records
+from senzing import SzBadInputError
+
+DATA_GLOBS = ("data/sg_test_v4/Singapore_File_*.json", "data/truth/customers.json")
+SHUFFLE_MODES = ("none", "stream", "file")
+
+
+class StandInEngine:
+    """
+    Stands in for SzEngine, configured by the benchmark's arguments. Each add or redo sleeps for --latency
+    milliseconds, like a call into the engine sleeping releases the GIL so worker threads overlap. --error-rate of the
+    calls raise SzBadInputError, --redo-rate of the adds queue a redo record and the redo queue starts with
+    --redo-depth records
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.entity_ids = itertools.count(1)
+        self.error_rate = args.error_rate
+        self.latency = args.latency / 1000
+        self.random = random.Random(args.seed)
+        self.redo: Deque[str] = deque(self._redo_record() for _ in range(args.redo_depth))
+        self.redo_rate = args.redo_rate
+
+    def _call(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise SzBadInputError("Stand-in engine injected error")
+
+    def _redo_record(self) -> str:
+        return json.dumps({"REASON": "Stand-in redo", "ENTITY_ID": next(self.entity_ids)})
+
+    def _with_info(self, data_source: str, record_id: str) -> str:
+        return json.dumps({"DATA_SOURCE": data_source, "RECORD_ID": record_id, "AFFECTED_ENTITIES": [{"ENTITY_ID": 1}]})
+
+    def add_record(self, data_source: str, record_id: str, record_definition: str, flags: int = 0) -> str:
+        """Add a record, the record definition isn't used"""
+        del record_definition
+        self._call()
+        if self.redo_rate and self.random.random() < self.redo_rate:
+            self.redo.append(self._redo_record())
+
+        return self._with_info(data_source, record_id) if flags else ""
+
+    def get_redo_record(self) -> str:
+        """Get the next redo record, an empty string when there aren't any"""
+        try:
+            return self.redo.popleft()
+        except IndexError:
+            return ""
+
+    def get_stats(self) -> str:
+        """Workload stats"""
+        return json.dumps({"workload": {}})
+
+    def process_redo_record(self, redo_record: str, flags: int = 0) -> str:
+        """Process a redo record, the redo record isn't used"""
+        del redo_record
+        self._call()
+        return self._with_info("REDO", "") if flags else ""
+
+
+def write_records(records_file: Path, scale: int) -> int:
+    """Write the test records scale times, each copy with new record IDs, returning the number of records"""
+    records: List[dict[str, Any]] = [json.loads(record) for record in read_test_records(DATA_GLOBS)]
+
+    with open(records_file, "w", encoding="utf-8") as records_out:
+        for copy in range(scale):
+            for record in records:
+                records_out.write(json.dumps({**record, "RECORD_ID": f"{record['RECORD_ID']}-{copy}"}) + "\n")
+
+    return len(records) * scale
+
+
+def run_load(
+    records_file: Path, work_path: Path, threads: int, batch_size: int, shuffle: str, args: Any
+) -> dict[str, Any]:
+    """Load records_file with sz_file_loader and the stand-in engine, run in its own process"""
+    loader = load_tool("sz_file_loader")
+    loader.logger.setLevel(logging.CRITICAL)
+
+    sys.argv = [loader.MODULE_NAME, "-nt", str(threads), "-bs", str(batch_size), "-sfi"]
+    if args.with_info:
+        sys.argv.append("-w")
+    if not args.redo:
+        sys.argv.append("-n")
+    cli_args = loader.parse_cli_args()
+    engine = StandInEngine(args)
+
+    # Children for shuf when shuffling to a file
+    start_cpu = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    start_time = time.perf_counter()
+
+    # Shuffling to a file is part of the time to load, like it is for sz_file_loader
+    load_file = records_file
+    if shuffle == "file":
+        load_file = loader.shuffle_ingest_file(cli_args, records_file, work_path) or records_file
+
+    with_info_file = work_path / f"with_info_{threads}_{batch_size}_{shuffle}.jsonl"
+    with loader.open_load_reader(
+        load_file, [(0, load_file.stat().st_size)], shuffle == "stream", cli_args.stream_shuffle_memory
+    ) as reader, loader.WithInfoWriter(with_info_file) as with_info_out:
+        results = loader.load_and_redo(
+            cli_args,
+            work_path / "errors.log",
+            with_info_file,
+            engine,
+            with_info_out,
+            reader,
+            records_file,
+            checkpoint=loader.LoadCheckpoint(reader, lambda _marks: None),
+        )
+
+    elapsed = time.perf_counter() - start_time
+    end_cpu = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    if load_file != records_file:
+        load_file.unlink()
+    with_info_file.unlink(missing_ok=True)
+
+    records = sum(
+        results[stats][count] for stats in ("load_stats", "redo_stats") for count in ("success_recs", "error_recs")
+    )
+    cpu = sum(end.ru_utime - start.ru_utime + end.ru_stime - start.ru_stime for start, end in zip(start_cpu, end_cpu))
+
+    return {
+        "threads": threads,
+        "batch_size": batch_size,
+        "shuffle": shuffle,
+        "records": records,
+        "load_recs": results["load_stats"]["success_recs"] + results["load_stats"]["error_recs"],
+        "redo_recs": results["redo_stats"]["success_recs"] + results["redo_stats"]["error_recs"],
+        "elapsed": elapsed,
+        "records_per_sec": records / elapsed,
+        "cpu_us_per_record": cpu / max(records, 1) * 1_000_000,
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": end_cpu[0].ru_maxrss / (1_048_576 if sys.platform == "darwin" else 1024),
+    }
+
+
+def main() -> None:
+    """main"""
+    arg_parser = argparse.ArgumentParser(description="Benchmark sz_file_loader with a stand-in engine")
+    arg_parser.add_argument("-s", "--scale", default=20, type=int, help="copies of the test records to load")
+    arg_parser.add_argument("-t", "--threads", default=[8, 32], nargs="+", type=int, help="thread counts to run")
+    arg_parser.add_argument("-b", "--batch-sizes", default=[1, 10], nargs="+", type=int, help="batch sizes to run")
+    arg_parser.add_argument(
+        "-m", "--shuffle-modes", choices=SHUFFLE_MODES, default=["none", "stream"], nargs="+", help="shuffle modes"
+    )
+    arg_parser.add_argument("-l", "--latency", default=0.0, type=float, help="milliseconds for each add and redo")
+    arg_parser.add_argument("-e", "--error-rate", default=0.0, type=float, help="fraction of adds and redos to fail")
+    arg_parser.add_argument("-rd", "--redo-depth", default=0, type=int, help="redo records queued before loading")
+    arg_parser.add_argument("-rr", "--redo-rate", default=0.1, type=float, help="fraction of adds that queue a redo")
+    arg_parser.add_argument("-nr", "--no-redo", action="store_false", dest="redo", help="don't process redo")
+    arg_parser.add_argument("-w", "--with-info", action="store_true", help="request and write with info")
+    arg_parser.add_argument("-r", "--repeats", default=1, type=int, help="times to repeat each run, best is used")
+    arg_parser.add_argument("--seed", default=1, type=int, help="random seed for error and redo injection")
+    arg_parser.add_argument("-o", "--output", default="", help="also write the results to this JSON file")
+    cli_args = arg_parser.parse_args()
+
+    results: List[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_path = Path(work_dir)
+        records_file = work_path / "records.json"
+        num_records = write_records(records_file, cli_args.scale)
+        print(
+            f"\n{num_records:,} records, latency {cli_args.latency} ms, error rate {cli_args.error_rate}, redo depth "
+            f"{cli_args.redo_depth}, redo rate {cli_args.redo_rate if cli_args.redo else 'no redo'}\n"
+        )
+        print(
+            f"{'Threads':>8} {'Batch':>6} {'Shuffle':>8} {'Records':>10} {'Recs/sec':>10} {'CPU us/rec':>11} {'RSS MB':>8}"
+        )
+
+        # Spawn a process for each run, forking would carry over the peak RSS and state of previous runs
+        mp_context = multiprocessing.get_context("spawn")
+        for threads, batch_size, shuffle in itertools.product(
+            cli_args.threads, cli_args.batch_sizes, cli_args.shuffle_modes
+        ):
+            runs = []
+            for _ in range(cli_args.repeats):
+                with ProcessPoolExecutor(1, mp_context=mp_context) as executor:
+                    runs.append(
+                        executor.submit(
+                            run_load, records_file, work_path, threads, batch_size, shuffle, cli_args
+                        ).result()
+                    )
+            best = max(runs, key=lambda run: run["records_per_sec"])
+            results.append(best)
+            print(
+                f"{threads:>8} {batch_size:>6} {shuffle:>8} {best['records']:>10,} {best['records_per_sec']:>10,.0f} "
+                f"{best['cpu_us_per_record']:>11,.1f} {best['peak_rss_mb']:>8,.1f}"
+            )
+    print()
+
+    if cli_args.output:
+        with open(cli_args.output, "w", encoding="utf-8") as output:
+            json.dump({"options": vars(cli_args), "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
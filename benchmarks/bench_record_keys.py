@@ -0,0 +1,78 @@
+#! /usr/bin/env python3
+"""
+Micro-benchmark for sz_file_loader getting DATA_SOURCE and RECORD_ID from each record to load. Compares a full JSON
+parse of the record against the top level key scan (get_record_keys), using the data/sg_test_v4 record files as is and as wide
+records with a nested array added to each record.
+
+Requires the Senzing Python SDK to be importable, as sz_file_loader is imported to use its functions.
+
+    python3 benchmarks/bench_record_keys.py
+    python3 benchmarks/bench_record_keys.py -r 10 -w 200
+"""
+
+import argparse
+import time
+from typing import Any, Callable, List
+
+from _bench_helpers import load_tool, read_test_records
+
+DATA_GLOBS = ("data/sg_test_v4/Singapore_File_*.json",)
+
+
+def read_records(wide_items: int) -> List[str]:
+    """Read the test records, optionally adding a nested array of wide_items entries to the end of each"""
+    records = read_test_records(DATA_GLOBS)
+    if not wide_items:
+        return records
+
+    nested = ", ".join(
+        f'{{"NAME_TYPE": "AKA", "NAME_FULL": "Name {idx}", "ADDR_FULL": "{idx} Main St"}}' for idx in range(wide_items)
+    )
+    return [f'{record[:-1]}, "NAMES": [{nested}]}}' for record in records]
+
+
+def time_it(func: Callable[[str], Any], records: List[str], repeats: int) -> float:
+    """Best time of repeats to call func for every record"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for record in records:
+            func(record)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    """main"""
+    arg_parser = argparse.ArgumentParser(description="Benchmark getting DATA_SOURCE and RECORD_ID from records")
+    arg_parser.add_argument("-r", "--repeats", default=5, type=int, help="times to repeat each test, best is used")
+    arg_parser.add_argument("-w", "--wide-items", default=100, type=int, help="nested items to add for wide records")
+    cli_args = arg_parser.parse_args()
+
+    loader = load_tool("sz_file_loader")
+
+    def full_parse(record: str) -> Any:
+        record_dict = loader._json_loads(record)  # pylint: disable=protected-access
+        return record_dict.get("DATA_SOURCE", ""), record_dict.get("RECORD_ID", "")
+
+    for desc, wide_items in (
+        ("Records as is", 0),
+        (f"Wide records, {cli_args.wide_items} nested items", cli_args.wide_items),
+    ):
+        records = read_records(wide_items)
+        mismatches = sum(1 for record in records if full_parse(record) != loader.get_record_keys(record))
+        fallbacks = sum(1 for record in records if loader.scan_record_keys(record) is None)
+        parse_time = time_it(full_parse, records, cli_args.repeats)
+        scan_time = time_it(loader.get_record_keys, records, cli_args.repeats)
+
+        print(f"\n{desc}: {len(records):,} records, average {sum(map(len, records)) // len(records):,} bytes")
+        print(f"  Full parse:  {len(records) / parse_time:>12,.0f} records/sec")
+        print(f"  Key scan:    {len(records) / scan_time:>12,.0f} records/sec  ({parse_time / scan_time:.1f}x)")
+        print(f"  Fallbacks:   {fallbacks:,}")
+        print(f"  Mismatches:  {mismatches:,}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -260,14 +260,16 @@ class SzDatabase:
         if parmList and type(parmList) not in (list, tuple):
             parmList = [parmList]
 
-        # --name and itersize are postgres server side cursor settings
+        # --name, itersize and withhold are postgres server side cursor settings
+        # --withhold is required to use a server side cursor on an autocommit connection
         cursorData = {}
         cursorData["NAME"] = kwargs["name"] if "name" in kwargs else None
         cursorData["ITERSIZE"] = kwargs["itersize"] if "itersize" in kwargs else None
+        cursorData["WITHHOLD"] = kwargs["withhold"] if "withhold" in kwargs else False
 
         try:
             if cursorData["NAME"] and self.connections[node]["psycopg2"]:
-                exec_cursor = self.connections[node]["dbo"].cursor(cursorData["NAME"])
+                exec_cursor = self.connections[node]["dbo"].cursor(cursorData["NAME"], withhold=cursorData["WITHHOLD"])
                 if cursorData["ITERSIZE"]:
                     exec_cursor.itersize = cursorData["ITERSIZE"]
             else:
@@ -0,0 +1,46 @@
+"""
+Fixtures for the sz_tools tests. The tools are extensionless scripts, they are imported as modules with the sz_tools
+directory on the path for their helper modules
+"""
+
+import importlib.machinery
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+TOOLS_PATH = Path(__file__).resolve().parent.parent / "sz_tools"
+
+
+def load_tool(tool_name: str) -> ModuleType:
+    """Import one of the extensionless sz_tools scripts as a module"""
+    if str(TOOLS_PATH) not in sys.path:
+        sys.path.insert(0, str(TOOLS_PATH))
+    spec = importlib.util.spec_from_loader(
+        tool_name, importlib.machinery.SourceFileLoader(tool_name, str(TOOLS_PATH / tool_name))
+    )
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+@pytest.fixture(name="sz_audit", scope="session")
+def fixture_sz_audit() -> ModuleType:
+    """The sz_audit tool"""
+    return load_tool("sz_audit")
+
+
+@pytest.fixture(name="sz_file_loader", scope="session")
+def fixture_sz_file_loader() -> ModuleType:
+    """The sz_file_loader tool"""
+    return load_tool("sz_file_loader")
+
+
+@pytest.fixture(name="sz_snapshot", scope="session")
+def fixture_sz_snapshot() -> ModuleType:
+    """The sz_snapshot tool"""
+    return load_tool("sz_snapshot")
@@ -0,0 +1,143 @@
+"""Tests for sz_audit"""
+
+import csv
+import gzip
+import itertools
+import json
+import random
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Tuple
+
+import pytest
+
+ENTITY_MAP_HEADERS = ["RESOLVED_ENTITY_ID", "RELATED_ENTITY_ID", "MATCH_LEVEL", "MATCH_KEY", "DATA_SOURCE", "RECORD_ID"]
+
+
+def write_entity_map(
+    file_name: Path, seed: int, num_records: int = 600, num_entities: int = 200, shared: float = 0.0
+) -> None:
+    """
+    An entity map with records randomly resolved into entities, some related entities and some missing records. The
+    rows are shuffled as entity maps don't have to be sorted. shared is the fraction of records also in a second entity
+    """
+    rand = random.Random(seed)
+    entities: dict[int, list[int]] = {}
+    for record_number in range(num_records):
+        if rand.random() < 0.03:
+            continue
+        entities.setdefault(rand.randint(1, num_entities), []).append(record_number)
+        if shared and rand.random() < shared:
+            entities.setdefault(rand.randint(1, num_entities), []).append(record_number)
+
+    rows: list[list[Any]] = []
+    for entity_id, record_numbers in entities.items():
+        for record_number in record_numbers:
+            match_key = rand.choice(["+NAME", "+NAME+DOB", "+ADDRESS", ""])
+            rows.append([entity_id, 0, 1, match_key, f"DS{record_number % 3}", f"R{record_number}"])
+        if rand.random() < 0.4:
+            rows.append([entity_id, rand.randint(1, num_entities), rand.choice([2, 3]), "+PHONE", "DS0", "R0"])
+    rand.shuffle(rows)
+
+    opener: Any = gzip.open if file_name.suffix == ".gz" else open
+    with opener(file_name, "wt", encoding="utf-8", newline="") as map_file:
+        csv_writer = csv.writer(map_file)
+        csv_writer.writerow(ENTITY_MAP_HEADERS)
+        csv_writer.writerows(rows)
+
+
+def audit_results(output_root: Path) -> Tuple[str, Any]:
+    """The csv and json files written by an audit"""
+    with open(f"{output_root}.json", "r", encoding="utf-8") as json_file:
+        return Path(f"{output_root}.csv").read_text(encoding="utf-8"), json.load(json_file)
+
+
+@pytest.mark.parametrize("sort_rows", [50, 100_000], ids=["merged_runs", "one_run"])
+def test_external_audit(sz_audit: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, sort_rows: int) -> None:
+    """Sorting the entity maps on disk gives the same audit as loading them into memory"""
+    write_entity_map(tmp_path / "newer.csv", 1)
+    write_entity_map(tmp_path / "prior.csv", 2)
+    # A narrow merge so the sorted runs are merged over more than one pass
+    monkeypatch.setattr(sz_audit, "SORT_MERGE_WIDTH", 4)
+
+    assert (
+        sz_audit.audit(str(tmp_path / "newer.csv"), str(tmp_path / "prior.csv"), str(tmp_path / "memory"), False) == 0
+    )
+    assert (
+        sz_audit.external_audit(
+            str(tmp_path / "newer.csv"),
+            str(tmp_path / "prior.csv"),
+            str(tmp_path / "external"),
+            str(tmp_path),
+            sort_rows,
+        )
+        == 0
+    )
+
+    assert audit_results(tmp_path / "external") == audit_results(tmp_path / "memory")
+    assert not list(tmp_path.glob("sz_audit_*"))
+
+
+def test_audit_gzip(sz_audit: ModuleType, tmp_path: Path) -> None:
+    """A gzip compressed entity map is audited the same as the csv file"""
+    write_entity_map(tmp_path / "newer.csv", 1)
+    write_entity_map(tmp_path / "newer.csv.gz", 1)
+    write_entity_map(tmp_path / "prior.csv", 2)
+
+    sz_audit.audit(str(tmp_path / "newer.csv"), str(tmp_path / "prior.csv"), str(tmp_path / "csv"), False)
+    sz_audit.audit(str(tmp_path / "newer.csv.gz"), str(tmp_path / "prior.csv"), str(tmp_path / "gzip"), False)
+
+    assert audit_results(tmp_path / "gzip") == audit_results(tmp_path / "csv")
+
+
+def checker_results(output: str) -> dict[str, str]:
+    """The values printed by stat_checker() by their names"""
+    results = {}
+    for line in output.splitlines():
+        if line.strip():
+            value, name = line.split()
+            results[name] = value
+
+    return results
+
+
+def test_stat_checker(sz_audit: ModuleType, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Pairs of records resolved together in both entity maps are true positives"""
+    write_entity_map(tmp_path / "newer.csv", 1)
+    write_entity_map(tmp_path / "prior.csv", 2)
+
+    assert sz_audit.stat_checker(str(tmp_path / "newer.csv"), str(tmp_path / "newer.csv")) == 0
+    same = checker_results(capsys.readouterr().out)
+    assert same["false_positives"] == same["false_negatives"] == "0"
+    assert same["precision"] == same["recall"] == same["f1-score"] == "1.0"
+
+    assert sz_audit.stat_checker(str(tmp_path / "newer.csv"), str(tmp_path / "prior.csv")) == 0
+    different = checker_results(capsys.readouterr().out)
+    assert int(different["true_positives"]) + int(different["false_positives"]) == int(different["newer_pairs"])
+    assert int(different["true_positives"]) + int(different["false_negatives"]) == int(different["prior_pairs"])
+    assert float(different["precision"]) < 1.0
+
+
+def entity_map_pairs(file_name: Path) -> set[Tuple[str, str]]:
+    """The distinct pairs of records resolved into the same entity"""
+    entities: dict[str, set[str]] = {}
+    with open(file_name, "r", encoding="utf-8", newline="") as map_file:
+        for row in csv.DictReader(map_file):
+            if row["RELATED_ENTITY_ID"] == "0":
+                entities.setdefault(row["RESOLVED_ENTITY_ID"], set()).add(f"{row['DATA_SOURCE']}|{row['RECORD_ID']}")
+
+    return {pair for records in entities.values() for pair in itertools.combinations(sorted(records), 2)}
+
+
+def test_stat_checker_shared_records(sz_audit: ModuleType, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """The pairs of records in more than one entity are each counted once"""
+    write_entity_map(tmp_path / "newer.csv", 3, num_entities=100, shared=0.2)
+    write_entity_map(tmp_path / "prior.csv", 4, num_entities=100, shared=0.2)
+    newer_pairs = entity_map_pairs(tmp_path / "newer.csv")
+    prior_pairs = entity_map_pairs(tmp_path / "prior.csv")
+
+    assert sz_audit.stat_checker(str(tmp_path / "newer.csv"), str(tmp_path / "prior.csv")) == 0
+    results = checker_results(capsys.readouterr().out)
+    assert int(results["newer_pairs"]) == len(newer_pairs)
+    assert int(results["prior_pairs"]) == len(prior_pairs)
+    assert int(results["true_positives"]) == len(newer_pairs & prior_pairs)
@@ -0,0 +1,649 @@
+"""Tests for sz_file_loader"""
+
+import gzip
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Iterator
+
+import pytest
+from senzing import SzUnrecoverableError
+
+
+def write_records(file_path: Path, count: int) -> None:
+    """Write count records with sequential record IDs"""
+    file_path.write_text(
+        "".join(f'{{"DATA_SOURCE": "TEST", "RECORD_ID": "{idx}"}}\n' for idx in range(count)), encoding="utf-8"
+    )
+
+
+def test_line_reader_is_abstract(sz_file_loader: ModuleType) -> None:
+    """Readers must implement reading lines with their positions and the unread positions"""
+    with pytest.raises(TypeError):
+        sz_file_loader.LineReader()
+
+
+def test_file_range_reader_ranges(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """Line aligned ranges split a file into parts that together have every line once"""
+    ingest_file = tmp_path / "records.jsonl"
+    write_records(ingest_file, 1000)
+    ranges = list(sz_file_loader.line_aligned_ranges(ingest_file, 4, 0, ingest_file.stat().st_size))
+
+    lines = []
+    for file_range in ranges:
+        with sz_file_loader.FileRangeReader(ingest_file, [file_range], block_size=512) as reader:
+            lines.extend(reader)
+
+    assert lines == ingest_file.read_text(encoding="utf-8").splitlines(keepends=True)
+
+
+def test_stream_shuffle_reader(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """Every line is returned once, in an order mixing the ranges, without the buffer growing past its memory"""
+    ingest_file = tmp_path / "records.jsonl"
+    write_records(ingest_file, 100_000)
+    file_lines = ingest_file.read_text(encoding="utf-8").splitlines(keepends=True)
+    ranges = sz_file_loader.line_aligned_ranges(ingest_file, 2)
+
+    max_line = max(len(line) for line in file_lines)
+    lines = []
+    range_indexes = []
+    with sz_file_loader.StreamShuffleReader(ingest_file, buffer_mb=1, ranges=ranges) as reader:
+        assert len(reader.ranges) > len(ranges)
+        while True:
+            line, range_idx, _ = reader.readline_position()
+            if not line:
+                break
+            lines.append(line)
+            range_indexes.append(range_idx)
+            assert reader.buffer_bytes < reader.buffer_max_bytes + max_line
+            if len(lines) % 10_000 == 0:
+                assert reader.buffer_bytes == sum(len(buffered) for buffered, _ in reader.buffer)
+
+    assert sorted(lines) == sorted(file_lines)
+    assert lines != file_lines
+    # The first lines are mixed from every segment of both ranges rather than read from the start of the file
+    assert set(range_indexes[:1000]) == set(range(len(reader.ranges)))
+
+
+def test_readers_crlf(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """CRLF line endings are read as "\\n", positions are of the raw lines"""
+    records = [f'{{"DATA_SOURCE": "TEST", "RECORD_ID": "{idx}"}}' for idx in range(100)]
+    raw = "".join(f"{record}\r\n" for record in records).encode("utf-8")
+    ingest_file = tmp_path / "records.jsonl"
+    ingest_file.write_bytes(raw)
+    gzip_file = tmp_path / "records.jsonl.gz"
+    gzip_file.write_bytes(gzip.compress(raw))
+
+    with sz_file_loader.FileRangeReader(ingest_file, [(0, len(raw))], block_size=512) as reader:
+        positions = [reader.readline_position() for _ in records]
+        assert reader.readline_position()[0] == ""
+    assert [line for line, _, _ in positions] == [f"{record}\n" for record in records]
+    assert [raw[start : start + len(record)].decode("utf-8") for record, (_, _, start) in zip(records, positions)] == (
+        records
+    )
+
+    with sz_file_loader.DecompressReader(gzip_file) as reader:
+        assert list(reader) == [f"{record}\n" for record in records]
+
+
+class CorruptStream:
+    """Stands in for a decompressed file, a decompression error is raised after some lines"""
+
+    def __enter__(self) -> "CorruptStream":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from (f'{{"RECORD_ID": "{idx}"}}\n'.encode("utf-8") for idx in range(10))
+        raise zlib.error("invalid stored block lengths")
+
+
+def test_decompress_reader_error(sz_file_loader: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Any error decompressing ends reading and is reported, the consumer isn't left waiting on the reader"""
+    monkeypatch.setattr(sz_file_loader, "open_ingest_binary", lambda _: CorruptStream())
+
+    try:
+        with sz_file_loader.DecompressReader(tmp_path / "records.jsonl.gz") as reader:
+            assert not list(reader)
+            assert isinstance(reader.read_error, zlib.error)
+        assert sz_file_loader.shutdown.is_set()
+    finally:
+        sz_file_loader.shutdown.clear()
+
+
+def long_record(members: str) -> str:
+    """A record with the members and a padding member so it's long enough for get_record_keys() to scan"""
+    return f'{{{members}, "PADDING": "{"x" * 2048}"}}'
+
+
+def test_get_record_keys_scanned(sz_file_loader: ModuleType) -> None:
+    """DATA_SOURCE and RECORD_ID are scanned from a long record"""
+    record = long_record('"DATA_SOURCE": "TEST", "RECORD_ID": "1"')
+
+    assert sz_file_loader.scan_record_keys(record) == ("TEST", "1")
+    assert sz_file_loader.get_record_keys(record) == ("TEST", "1")
+
+
+def test_get_record_keys_duplicate_key(sz_file_loader: ModuleType) -> None:
+    """The last value of a repeated key is used, as a full parse would"""
+    record = long_record('"DATA_SOURCE": "TEST", "RECORD_ID": "1", "RECORD_ID": "2"')
+
+    assert sz_file_loader.scan_record_keys(record) is None
+    assert sz_file_loader.get_record_keys(record) == ("TEST", "2")
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        long_record('"DATA_SOURCE": "TEST", "RECORD_ID": "1", "NAMES": [{"NAME_FULL": "A"}')[:-1],
+        long_record('"DATA_SOURCE": "TEST", "RECORD_ID": "1", "NAMES": [{"NAME_FULL": "A"}]')[:-1],
+        long_record('"DATA_SOURCE": "TEST", "RECORD_ID": "1", "NAME": "A" "B"'),
+    ],
+    ids=["truncated", "unclosed", "invalid"],
+)
+def test_get_record_keys_invalid_json(sz_file_loader: ModuleType, record: str) -> None:
+    """A record that isn't valid JSON is an error, it isn't loaded with scanned keys"""
+    with pytest.raises(ValueError):
+        sz_file_loader.get_record_keys(record)
+
+
+class FailingEngine:  # pylint: disable=too-few-public-methods
+    """Stands in for SzEngine, adding a record raises an unrecoverable error on the fail_on call"""
+
+    def __init__(self, fail_on: int) -> None:
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def add_record(self, *args: Any) -> str:
+        """Count the call, raising on the fail_on call"""
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise SzUnrecoverableError("engine failed")
+        return ""
+
+
+def test_process_batch_unrecoverable(sz_file_loader: ModuleType) -> None:
+    """After an unrecoverable error the rest of a batch isn't processed and is counted as errors"""
+    records = [f'{{"DATA_SOURCE": "TEST", "RECORD_ID": "{idx}"}}' for idx in range(5)]
+    engine = FailingEngine(fail_on=2)
+    batch = sz_file_loader.RecordBatch(records)
+
+    result = sz_file_loader.process_batch(sz_file_loader.add_record, engine, batch, False)
+
+    assert engine.calls == 2
+    assert result.success == 1
+    assert [record for _, record in result.errors] == records[1:]
+    assert batch.current == 1
+
+
+class AddEngine:  # pylint: disable=too-few-public-methods
+    """Stands in for SzEngine, adding records always succeeds"""
+
+    def add_record(self, *args: Any) -> str:
+        """Add a record"""
+        return ""
+
+
+def test_process_batch_profile(sz_file_loader: ModuleType) -> None:
+    """When profiling the worker finds the shape of each record, which the profile is updated with"""
+    records = ['{"DATA_SOURCE": "TEST", "RECORD_ID": "1", "NAME_FULL": "A", "ADDRESSES": [{}, {}]}', "\n"]
+    batch = sz_file_loader.RecordBatch(records)
+
+    sz_file_loader.process_batch(sz_file_loader.add_record, AddEngine(), batch, False, profile=True)
+    assert batch.shapes == [("TEST", "1", len(records[0]), 3), None]
+
+    profile = sz_file_loader.LoadProfile()
+    profile.completed(batch.shapes, batch.latencies)
+    assert list(profile.by_data_source) == ["TEST"]
+    assert [slow[1:] for slow in profile.slowest] == [("TEST", "1", len(records[0]), 3)]
+
+
+class RedoEngine:  # pylint: disable=too-few-public-methods
+    """Stands in for SzEngine, always has another redo record"""
+
+    def __init__(self) -> None:
+        self.redo_ids = itertools.count()
+
+    def get_redo_record(self) -> str:
+        """The next redo record"""
+        return f'{{"REDO": {next(self.redo_ids)}}}'
+
+
+def test_redo_prefetcher_close_without_consumer(sz_file_loader: ModuleType) -> None:
+    """Closing stops fetcher threads waiting for space in a full queue when processing has stopped taking records"""
+    prefetcher = sz_file_loader.RedoPrefetcher(RedoEngine(), 2, 1)
+    while not prefetcher.redo_queue.full():
+        time.sleep(0.01)
+
+    closer = threading.Thread(target=prefetcher.close, daemon=True)
+    closer.start()
+    closer.join(timeout=10)
+
+    assert not closer.is_alive()
+    assert not any(thread.is_alive() for thread in prefetcher.threads)
+
+
+class StatsEngine:  # pylint: disable=too-few-public-methods
+    """Stands in for SzEngine, workload stats with the contention of each call to get_stats"""
+
+    def __init__(self, contention: list[int]) -> None:
+        self.calls = 0
+        self.contention = contention
+
+    def get_stats(self) -> str:
+        """Workload stats with the next contention"""
+        self.calls += 1
+        return json.dumps({"workload": {"threadState": {"active": 4, "resolverContention": self.contention.pop(0)}}})
+
+
+class StopAfterLoadingEngine:
+    """Stands in for SzEngine, the last records stay in flight until stats are fetched, which stops processing"""
+
+    def __init__(self, shutdown: threading.Event, in_flight_from: int) -> None:
+        self.in_flight_from = in_flight_from
+        self.release = threading.Event()
+        self.shutdown = shutdown
+
+    def add_record(self, *args: Any) -> str:
+        """Wait for stats to be fetched for the last records, the with info response is the record ID"""
+        if int(args[1]) >= self.in_flight_from:
+            self.release.wait(10)
+        return json.dumps({"RECORD_ID": args[1]})
+
+    def get_stats(self) -> str:
+        """Workload stats logged when loading completes, stop processing and complete the records in flight"""
+        self.shutdown.set()
+        self.release.set()
+        return "{}"
+
+    def get_redo_record(self) -> str:
+        """No redo records"""
+        return ""
+
+
+def test_redo_overlap_stopped(sz_file_loader: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stopping before processing redo starts with --redo-overlap still completes the records loading"""
+    ingest_file = tmp_path / "records.jsonl"
+    write_records(ingest_file, 20)
+    monkeypatch.setattr(
+        sys, "argv", ["sz_file_loader", "--redo-overlap", "--with-info", "--num-threads", "4", "--batch-size", "1"]
+    )
+    cli_args = sz_file_loader.parse_cli_args()
+    saved: list[list[list[int]]] = []
+    try:
+        with sz_file_loader.WithInfoWriter(tmp_path / "with_info.jsonl") as with_info_out:
+            with sz_file_loader.FileRangeReader(ingest_file, [(0, ingest_file.stat().st_size)]) as reader:
+                results = sz_file_loader.load_and_redo(
+                    cli_args,
+                    tmp_path / "errors.log",
+                    tmp_path / "with_info.jsonl",
+                    StopAfterLoadingEngine(sz_file_loader.shutdown, 18),
+                    with_info_out,
+                    reader,
+                    ingest_file,
+                    checkpoint=sz_file_loader.LoadCheckpoint(reader, saved.append),
+                )
+        assert sz_file_loader.shutdown.is_set()
+    finally:
+        sz_file_loader.shutdown.clear()
+
+    assert results["load_stats"]["success_recs"] == 20
+    assert sorted(json.loads(line)["RECORD_ID"] for line in read_with_info(tmp_path / "with_info.jsonl")) == sorted(
+        str(idx) for idx in range(20)
+    )
+    assert saved[-1] == [[ingest_file.stat().st_size, ingest_file.stat().st_size]]
+
+
+def test_concurrency_tuner(sz_file_loader: ModuleType) -> None:
+    """The limit is cut when threads wait on contention, the stats fetched for tuning are the ones logged"""
+    engine = StatsEngine([12, 0])
+    tuner = sz_file_loader.ConcurrencyTuner(engine, 16, "adds")
+    assert tuner.limit == 8
+
+    tuner.completed(100, 1.0)
+    tuner.tune(tuner.window_start + sz_file_loader.AUTO_TUNE_INTERVAL / 2)
+    assert engine.calls == 0
+
+    tuner.tune(tuner.window_start + sz_file_loader.AUTO_TUNE_INTERVAL)
+    assert tuner.limit == 6
+    assert json.loads(tuner.stats)["workload"]["threadState"]["resolverContention"] == 12
+
+    tuner.completed(200, 1.0)
+    tuner.tune(tuner.window_start + sz_file_loader.AUTO_TUNE_INTERVAL)
+    assert tuner.limit == 5
+
+    # Fetching the stats resets the engine's counters, logging them doesn't fetch them again
+    sz_file_loader.workload_stats(engine, tuner.stats)
+    assert engine.calls == 2
+
+
+def read_with_info(with_info_file: Path) -> list[str]:
+    """Lines of a with info file and the files it was rotated to"""
+    lines = []
+    for out_file in sorted(with_info_file.parent.glob(f"{with_info_file.name.split('.')[0]}*")):
+        opener: Any = gzip.open if out_file.suffix == ".gz" else open
+        with opener(out_file, "rt", encoding="utf-8") as with_info_in:
+            lines.extend(with_info_in.read().splitlines())
+    return lines
+
+
+@pytest.mark.parametrize(
+    ("file_name", "compression", "rotate_mb"),
+    [("with_info.jsonl", "", 1), ("with_info.jsonl.gz", "gzip", 0)],
+    ids=["rotated", "gzip"],
+)
+def test_with_info_writer(
+    sz_file_loader: ModuleType, tmp_path: Path, file_name: str, compression: str, rotate_mb: int
+) -> None:
+    """Responses written from several threads are each written once and in full when loading completes"""
+    responses = [
+        f'{{"DATA_SOURCE": "TEST", "RECORD_ID": "{idx}", "AFFECTED_ENTITIES": [{idx}]}}' for idx in range(60_000)
+    ]
+
+    with sz_file_loader.WithInfoWriter(tmp_path / file_name, compression, rotate_mb) as with_info_out:
+
+        def write(thread_idx: int) -> None:
+            for response in responses[thread_idx::4]:
+                with_info_out.write(f"{response}\n")
+
+        threads = [threading.Thread(target=write, args=(thread_idx,)) for thread_idx in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert sorted(read_with_info(tmp_path / file_name)) == sorted(responses)
+    num_files = len(list(tmp_path.glob("with_info*")))
+    assert num_files > 1 if rotate_mb else num_files == 1
+
+
+def test_with_info_writer_load_failed(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """Responses buffered when loading fails are still written"""
+    with pytest.raises(RuntimeError):
+        with sz_file_loader.WithInfoWriter(tmp_path / "with_info.jsonl") as with_info_out:
+            for idx in range(10):
+                with_info_out.write(f'{{"RECORD_ID": "{idx}"}}\n')
+            assert with_info_out.chunk
+            raise RuntimeError("loading failed")
+
+    assert read_with_info(tmp_path / "with_info.jsonl") == [f'{{"RECORD_ID": "{idx}"}}' for idx in range(10)]
+
+
+def test_load_metrics_progress(sz_file_loader: ModuleType) -> None:
+    """Progress messages carry the counters of the metrics, the latencies only when they're published"""
+    metrics = sz_file_loader.LoadMetrics(profile_records=5)
+    metrics.completed("load", 3, [0.001, 0.002, 0.004])
+    metrics.error("load", ValueError("bad record"))
+    metrics.set_in_flight(7)
+
+    counters = sz_file_loader.LoadMetrics.from_progress(metrics.progress())
+    assert counters.success == metrics.success
+    assert counters.errors == metrics.errors
+    assert counters.in_flight_max == 7
+    assert counters.latency["load"].count == 0
+    assert "latency" not in metrics.progress()
+
+    published = sz_file_loader.LoadMetrics.from_progress(metrics.progress(latency=True))
+    assert published.prometheus() == metrics.prometheus()
+
+
+def test_load_metrics_first_window(sz_file_loader: ModuleType) -> None:
+    """The rate of the first sample is measured from when the metrics started, not reported as 0"""
+    metrics = sz_file_loader.LoadMetrics()
+    metrics.start_time = 100.0
+    metrics.completed("load", 50, [])
+    metrics.sample(110.0)
+    assert metrics.rates["load"] == 5.0
+
+    # A sample after a gap longer than the window is measured from the prior sample
+    metrics.completed("load", 100, [])
+    metrics.sample(110.0 + sz_file_loader.METRICS_WINDOW * 2)
+    assert metrics.rates["load"] == 100 / (sz_file_loader.METRICS_WINDOW * 2)
+
+
+def test_checkpoint_parallel_files(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """Files loading at the same time update the shared checkpoints without losing or corrupting each other's"""
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoints: dict[str, Any] = {}
+
+    def load_file(source_file: str) -> None:
+        sz_file_loader.update_checkpoint(checkpoint_file, checkpoints, source_file, {"ranges": [], "complete": False})
+        for position in range(50):
+            sz_file_loader.save_load_checkpoint(checkpoint_file, checkpoints, source_file, [[position, 100]])
+        sz_file_loader.update_checkpoint(checkpoint_file, checkpoints, source_file, {"complete": True})
+
+    threads = [threading.Thread(target=load_file, args=(f"file_{idx}.json",)) for idx in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    expected = {f"file_{idx}.json": {"ranges": [[49, 100]], "complete": True} for idx in range(8)}
+    assert checkpoints == expected
+    assert sz_file_loader.read_checkpoint(checkpoint_file) == expected
+
+
+class InterruptEngine:
+    """Stands in for SzEngine, counting the adds of each record and stopping loading after stop_after adds"""
+
+    def __init__(self, shutdown: threading.Event, stop_after: int = 0) -> None:
+        self.added: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.shutdown = shutdown
+        self.stop_after = stop_after
+
+    def add_record(self, *args: Any) -> str:
+        """Count the add of the record ID, stopping loading on the stop_after add"""
+        with self.lock:
+            self.added[args[1]] += 1
+            if sum(self.added.values()) == self.stop_after:
+                self.shutdown.set()
+        return ""
+
+    def get_stats(self) -> str:
+        """Workload stats logged when loading completes"""
+        return "{}"
+
+
+@pytest.mark.parametrize(
+    ("file_name", "batch_size"), [("records.jsonl", "1"), ("records.jsonl.gz", "10")], ids=["file", "compressed"]
+)
+def test_checkpoint_resume_stream_shuffle(
+    sz_file_loader: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, file_name: str, batch_size: str
+) -> None:
+    """Resuming a load shuffled in memory adds the records that weren't added before it stopped, and only those"""
+    write_records(tmp_path / "records.jsonl", 60_000)
+    ingest_file = tmp_path / file_name
+    if file_name.endswith(".gz"):
+        ingest_file.write_bytes(gzip.compress((tmp_path / "records.jsonl").read_bytes()))
+    ranges = [(0, -1)] if file_name.endswith(".gz") else [(0, ingest_file.stat().st_size)]
+    monkeypatch.setattr(sys, "argv", ["sz_file_loader", "--no-redo", "--num-threads", "4", "--batch-size", batch_size])
+    cli_args = sz_file_loader.parse_cli_args()
+
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoints: dict[str, Any] = {}
+    sz_file_loader.update_checkpoint(
+        checkpoint_file,
+        checkpoints,
+        str(ingest_file),
+        {
+            "read_file": str(ingest_file),
+            "read_size": ingest_file.stat().st_size,
+            "source_size": ingest_file.stat().st_size,
+            "source_mtime": ingest_file.stat().st_mtime,
+            "ranges": ranges,
+        },
+    )
+    save = partial(sz_file_loader.save_load_checkpoint, checkpoint_file, checkpoints, str(ingest_file))
+
+    def load(engine: InterruptEngine, load_ranges: list[tuple[int, int]], done: list[int]) -> None:
+        with sz_file_loader.WithInfoWriter(tmp_path / "with_info.jsonl") as with_info_out:
+            with sz_file_loader.open_load_reader(ingest_file, load_ranges, True, 1) as reader:
+                sz_file_loader.load_and_redo(
+                    cli_args,
+                    tmp_path / "errors.log",
+                    tmp_path / "with_info.jsonl",
+                    engine,
+                    with_info_out,
+                    reader,
+                    ingest_file,
+                    checkpoint=sz_file_loader.LoadCheckpoint(reader, save, done),
+                )
+
+    try:
+        stopped = InterruptEngine(sz_file_loader.shutdown, stop_after=25_000)
+        load(stopped, ranges, [])
+        assert sz_file_loader.shutdown.is_set()
+    finally:
+        sz_file_loader.shutdown.clear()
+
+    resume = sz_file_loader.resume_checkpoint(
+        sz_file_loader.read_checkpoint(checkpoint_file)[str(ingest_file)], ingest_file
+    )
+    assert resume
+    _, resume_ranges, done = resume
+    resumed = InterruptEngine(sz_file_loader.shutdown)
+    load(resumed, resume_ranges, done)
+
+    assert 25_000 <= sum(stopped.added.values()) < 60_000
+    assert set(stopped.added + resumed.added) == {str(idx) for idx in range(60_000)}
+    # No record is added again when resuming
+    assert max((stopped.added + resumed.added).values()) == 1
+
+
+def test_checkpoint_resume_shards(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """Shards of a compressed file save their own marks, resuming completes the lines between them"""
+    ingest_file = tmp_path / "records.jsonl.gz"
+    ingest_file.write_bytes(gzip.compress(b"{}\n" * 100))
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoints: dict[str, Any] = {}
+    sz_file_loader.update_checkpoint(
+        checkpoint_file,
+        checkpoints,
+        str(ingest_file),
+        {
+            "read_file": str(ingest_file),
+            "read_size": ingest_file.stat().st_size,
+            "source_size": ingest_file.stat().st_size,
+            "source_mtime": ingest_file.stat().st_mtime,
+        },
+    )
+    # Shard 1 is behind at line 22 with line 25 complete, shard 0 has loaded to line 60 and shard 2 to line 41
+    shards = [[60], [22, 25], [41, 44]]
+    sz_file_loader.save_load_checkpoint(checkpoint_file, checkpoints, str(ingest_file), [[22, -1]], shards=shards)
+
+    checkpoint = sz_file_loader.read_checkpoint(checkpoint_file)[str(ingest_file)]
+    assert checkpoint["ranges"] == [[22, -1]]
+    assert checkpoint["shards"] == shards
+    resume = sz_file_loader.resume_checkpoint(checkpoint, ingest_file)
+    assert resume
+    _, ranges, done = resume
+    assert ranges == [(22, -1)]
+    assert sorted(done) == sorted([*range(24, 60, 3), 25, *range(23, 41, 3), 44])
+
+    # Saving without shards, such as resuming without --processes, replaces the shards
+    sz_file_loader.save_load_checkpoint(checkpoint_file, checkpoints, str(ingest_file), [[30, -1, 31]])
+    assert sz_file_loader.resume_checkpoint(checkpoints[str(ingest_file)], ingest_file)[1:] == ([(30, -1)], [31])
+
+
+def test_checkpoint_unrecoverable(sz_file_loader: ModuleType, tmp_path: Path) -> None:
+    """The record that raised an unrecoverable error isn't complete, the checkpoint resumes from it"""
+    ingest_file = tmp_path / "records.jsonl"
+    write_records(ingest_file, 10)
+    with sz_file_loader.FileRangeReader(ingest_file, [(0, ingest_file.stat().st_size)]) as reader:
+        checkpoint = sz_file_loader.LoadCheckpoint(reader, lambda _: None)
+        records, positions = zip(*(checkpoint.readline() for _ in range(5)))
+        batch = sz_file_loader.RecordBatch(list(records), list(positions))
+        batch.current = 2
+        checkpoint.completed(batch, unrecoverable=True)
+        single = checkpoint.readline()
+        checkpoint.completed((single[0], 0.0, single[1]), unrecoverable=True)
+
+        assert checkpoint.marks() == [[positions[2][1], ingest_file.stat().st_size]]
+        assert checkpoint.in_flight == [{position for _, position in [*positions[2:], single[1]]}]
+
+
+def test_load_file_range_error(sz_file_loader: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A --processes worker that fails with an error other than SzError reports that loading stopped"""
+    ingest_file = tmp_path / "records.jsonl"
+    write_records(ingest_file, 10)
+    monkeypatch.setattr(sys, "argv", ["sz_file_loader", "--no-redo"])
+    cli_args = sz_file_loader.parse_cli_args()
+
+    def create_engine_failed(*_: Any, **__: Any) -> None:
+        raise OSError("No space left on device")
+
+    # The worker replaces the handlers and level of the logger, ignores interrupts and watches for the main process
+    # stopping it
+    monkeypatch.setattr(sz_file_loader.logger, "handlers", [])
+    monkeypatch.setattr(sz_file_loader.logger, "level", sz_file_loader.logger.level)
+    monkeypatch.setattr(sz_file_loader.signal, "signal", lambda *_: None)
+    monkeypatch.setattr(sz_file_loader, "process_stop_watcher", lambda _: None)
+    monkeypatch.setattr(sz_file_loader, "SzAbstractFactoryCore", create_engine_failed)
+    msg_queue: queue.Queue[Any] = queue.Queue()
+    try:
+        sz_file_loader.load_file_range(
+            cli_args,
+            tmp_path / "errors.log",
+            tmp_path / "with_info.jsonl",
+            "{}",
+            ingest_file,
+            [(0, ingest_file.stat().st_size)],
+            (0, 1),
+            False,
+            msg_queue,
+            threading.Event(),
+            [],
+        )
+        messages = list(msg_queue.queue)
+    finally:
+        sz_file_loader.shutdown.clear()
+
+    assert messages[0][0] == "LOG"
+    assert "No space left on device" in messages[0][1].getMessage()
+    assert messages[-1][:4] == ("DONE", sz_file_loader.os.getpid(), None, True)
+
+
+def test_summary_results_resumed_first_file_complete(
+    sz_file_loader: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Resuming a load of files where the first file completed has no results for it, the summary still reports"""
+    monkeypatch.setattr(sys, "argv", ["sz_file_loader", "--no-redo", "--shuffle-no-delete", "--with-info"])
+    cli_args = sz_file_loader.parse_cli_args()
+    with_info_file = tmp_path / "with_info.jsonl"
+    overall_results: dict[str, Any] = {}
+    with sz_file_loader.WithInfoWriter(with_info_file) as with_info_out:
+        # File 1 is skipped by load_file, the checkpoint marks it complete
+        for idx in (2, 3):
+            ingest_file = tmp_path / f"records_{idx}.jsonl"
+            write_records(ingest_file, 100)
+            with sz_file_loader.open_load_reader(ingest_file, [(0, ingest_file.stat().st_size)], False, 1) as reader:
+                overall_results[str(idx)] = sz_file_loader.load_and_redo(
+                    cli_args,
+                    tmp_path / "errors.log",
+                    with_info_file,
+                    InterruptEngine(sz_file_loader.shutdown),
+                    with_info_out,
+                    reader,
+                    ingest_file,
+                )
+
+    monkeypatch.setattr(sz_file_loader.logger, "propagate", True)
+    with caplog.at_level("INFO"):
+        sz_file_loader.summary_results(cli_args, overall_results)
+
+    assert "Files processed:  2" in caplog.messages
+    assert "Files shuffled:   No" in caplog.messages
+    assert f"With info file:   {with_info_file.resolve()}" in caplog.messages
+    assert "Errors file:      No errors" in caplog.messages
+    assert "Loaded records:   200" in caplog.messages
@@ -0,0 +1,477 @@
+"""Tests for sz_snapshot"""
+
+import argparse
+import collections
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+SZ_CONFIG_DATA = {
+    "G2_CONFIG": {
+        "CFG_DSRC": [{"DSRC_ID": 1, "DSRC_CODE": "CUSTOMERS"}, {"DSRC_ID": 2, "DSRC_CODE": "WATCHLIST"}],
+        "CFG_ERRULE": [
+            {"ERRULE_ID": 100, "ERRULE_CODE": "SF1", "RTYPE_ID": 1},
+            {"ERRULE_ID": 101, "ERRULE_CODE": "CNAME", "RTYPE_ID": 2},
+            {"ERRULE_ID": 102, "ERRULE_CODE": "ADDRESS", "RTYPE_ID": 3},
+        ],
+        "CFG_FTYPE": [{"FTYPE_ID": 1, "FTYPE_CODE": "NAME", "DERIVED": "No"}],
+    }
+}
+
+EXPORT_FIELDS = [
+    "RESOLVED_ENTITY_ID",
+    "RELATED_ENTITY_ID",
+    "MATCH_LEVEL",
+    "MATCH_KEY",
+    "IS_DISCLOSED",
+    "IS_AMBIGUOUS",
+    "ERRULE_CODE",
+    "DATA_SOURCE",
+    "RECORD_ID",
+]
+
+# The readers and writer run in processes that are given the database and configuration by forking
+needs_fork = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="snapshot processes are started by forking"
+)
+
+
+def build_database(db_file: Path, num_entities: int = 60) -> None:
+    """A repository with 1 to 3 records in each entity, some entities without records and some relationships"""
+    db = sqlite3.connect(db_file)
+    db.executescript(
+        """
+        create table RES_ENT (RES_ENT_ID integer primary key);
+        create table RES_ENT_OKEY (RES_ENT_ID integer, OBS_ENT_ID integer, ERRULE_ID integer, MATCH_KEY text);
+        create table OBS_ENT (OBS_ENT_ID integer, ENT_SRC_KEY text, DSRC_ID integer);
+        create table DSRC_RECORD (ENT_SRC_KEY text, DSRC_ID integer, RECORD_ID text);
+        create table RES_REL_EKEY (RES_ENT_ID integer, REL_ENT_ID integer, RES_REL_ID integer);
+        create table RES_FEAT_EKEY (RES_ENT_ID integer, LIB_FEAT_ID integer, FTYPE_ID integer, SUPPRESSED text);
+        create table RES_RELATE (
+            RES_REL_ID integer, LAST_ERRULE_ID integer, IS_DISCLOSED integer, IS_AMBIGUOUS integer, MATCH_KEY text
+        );
+        """
+    )
+    obs_ent_id = 0
+    for entity_id in range(1, num_entities + 1):
+        db.execute("insert into RES_ENT values (?)", (entity_id,))
+        if entity_id % 13 == 0:
+            continue
+        for record_idx in range(entity_id % 3 + 1):
+            obs_ent_id += 1
+            dsrc_id = obs_ent_id % 2 + 1
+            db.execute("insert into OBS_ENT values (?, ?, ?)", (obs_ent_id, f"KEY{obs_ent_id}", dsrc_id))
+            db.execute("insert into DSRC_RECORD values (?, ?, ?)", (f"KEY{obs_ent_id}", dsrc_id, str(obs_ent_id)))
+            db.execute("insert into RES_FEAT_EKEY values (?, ?, 1, 'N')", (entity_id, obs_ent_id))
+            db.execute(
+                "insert into RES_ENT_OKEY values (?, ?, ?, ?)",
+                (entity_id, obs_ent_id, 100 if record_idx else 0, "+NAME" if record_idx else None),
+            )
+    for entity_id in range(5, num_entities - 7, 5):
+        if entity_id % 13 and (entity_id + 7) % 13:
+            add_relationship(db, entity_id, entity_id + 7, entity_id)
+    db.commit()
+    db.close()
+
+
+def add_relationship(db: sqlite3.Connection, entity_id: int, related_id: int, res_rel_id: int) -> None:
+    """Relate two entities, possible matches and possible relations alternate"""
+    errule_id = 101 if res_rel_id % 2 else 102
+    db.execute("insert into RES_RELATE values (?, ?, 0, 0, '+ADDRESS')", (res_rel_id, errule_id))
+    db.execute("insert into RES_REL_EKEY values (?, ?, ?)", (entity_id, related_id, res_rel_id))
+    db.execute("insert into RES_REL_EKEY values (?, ?, ?)", (related_id, entity_id, res_rel_id))
+
+
+@pytest.fixture(name="snapshot_kwargs")
+def fixture_snapshot_kwargs(sz_snapshot: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Any:
+    """The settings of a snapshot of a test repository"""
+    db_file = tmp_path / "G2C.db"
+    build_database(db_file)
+    monkeypatch.setattr(sz_snapshot, "sz_config_data", SZ_CONFIG_DATA, raising=False)
+
+    return {
+        "sz_db_uri": f"sqlite3://na:na@{db_file}",
+        "sz_config_data": SZ_CONFIG_DATA,
+        "dsrc_id_filter": None,
+        "sample_size": 1000,
+        "relationship_filter": 3,
+        "for_audit": True,
+        "chunk_size": 100,
+        "range_size": 0,
+        "process_count": 3,
+        "audit_format": "csv",
+    }
+
+
+def take_snapshot(sz_snapshot: ModuleType, snapshot_kwargs: Any, output_root: Path, **settings: Any) -> Any:
+    """Take a database snapshot, returning the kwargs it was taken with"""
+    kwargs = dict(
+        snapshot_kwargs,
+        stats_file_name=f"{output_root}.json",
+        csv_file_name=f"{output_root}{sz_snapshot.AUDIT_FORMATS[snapshot_kwargs['audit_format']]}",
+        stat_pack={},
+        proc_start_time=time.time(),
+        **settings,
+    )
+    sz_snapshot.database_snapshot(sz_snapshot.SzDatabase(kwargs["sz_db_uri"]), kwargs)
+
+    return kwargs
+
+
+def comparable_stats(stats_file_name: str) -> Any:
+    """The stats of a snapshot without how it was taken, samples are sorted as they can be collected in any order"""
+
+    def sort_samples(stats: Any) -> Any:
+        if isinstance(stats, dict):
+            return {str(key): sort_samples(value) for key, value in stats.items()}
+        if isinstance(stats, list):
+            return sorted(str(value) for value in stats)
+        return stats
+
+    with open(stats_file_name, "r", encoding="utf-8") as stats_file:
+        stats = json.load(stats_file)
+    stats.pop("PROCESS")
+
+    return sort_samples(stats)
+
+
+def read_audit_rows(sz_snapshot: ModuleType, csv_file_name: str) -> collections.Counter[tuple[str, ...]]:
+    """The header and rows of a --for_audit file of any format, the rows in any order"""
+    return collections.Counter(tuple(str(value) for value in row) for row in sz_snapshot.read_audit_rows(csv_file_name))
+
+
+def export_rows(db_file: Path) -> list[str]:
+    """
+    The rows of a csv entity report export of a test repository, with the values the database snapshot reads for each
+    record and relationship
+    """
+    dsrc_codes = {dsrc["DSRC_ID"]: dsrc["DSRC_CODE"] for dsrc in SZ_CONFIG_DATA["G2_CONFIG"]["CFG_DSRC"]}
+    errules = {errule["ERRULE_ID"]: errule for errule in SZ_CONFIG_DATA["G2_CONFIG"]["CFG_ERRULE"]}
+    db = sqlite3.connect(db_file)
+    record_rows = db.execute(
+        "select a.RES_ENT_ID, a.ERRULE_ID, a.MATCH_KEY, b.DSRC_ID, c.RECORD_ID from RES_ENT_OKEY a "
+        "join OBS_ENT b on b.OBS_ENT_ID = a.OBS_ENT_ID "
+        "join DSRC_RECORD c on c.ENT_SRC_KEY = b.ENT_SRC_KEY and c.DSRC_ID = b.DSRC_ID"
+    ).fetchall()
+    related_rows = db.execute(
+        "select a.RES_ENT_ID, a.REL_ENT_ID, b.LAST_ERRULE_ID, b.IS_DISCLOSED, b.IS_AMBIGUOUS, b.MATCH_KEY, d.DSRC_ID "
+        "from RES_REL_EKEY a join RES_RELATE b on b.RES_REL_ID = a.RES_REL_ID "
+        "join RES_ENT_OKEY c on c.RES_ENT_ID = a.REL_ENT_ID join OBS_ENT d on d.OBS_ENT_ID = c.OBS_ENT_ID"
+    ).fetchall()
+    db.close()
+
+    rows: list[tuple[Any, ...]] = []
+    for entity_id, errule_id, match_key, dsrc_id, record_id in record_rows:
+        errule_code = errules[errule_id]["ERRULE_CODE"] if errule_id else "unk"
+        rows.append((entity_id, 0, 1, match_key or "", 0, 0, errule_code, dsrc_codes[dsrc_id], record_id))
+    for entity_id, related_id, errule_id, disclosed, ambiguous, match_key, dsrc_id in related_rows:
+        errule = errules[errule_id]
+        rows.append(
+            (
+                entity_id,
+                related_id,
+                errule["RTYPE_ID"],
+                match_key,
+                disclosed,
+                ambiguous,
+                errule["ERRULE_CODE"],
+                dsrc_codes[dsrc_id],
+                "n/a",
+            )
+        )
+    # The rows of each entity are together, its records first
+    rows.sort(key=lambda row: int(row[0]))
+
+    export = io.StringIO()
+    csv.writer(export, lineterminator="\n").writerows([EXPORT_FIELDS, *rows])
+
+    return export.getvalue().splitlines(keepends=True)
+
+
+class ExportEngine:
+    """Stands in for SzEngine, exporting rows as a csv entity report"""
+
+    def __init__(self, rows: list[str]) -> None:
+        self.rows = iter(rows)
+
+    def export_csv_entity_report(self, *args: Any) -> int:
+        """Start the export"""
+        return 1
+
+    def fetch_next(self, *args: Any) -> str:
+        """The next row of the export, "" when it's complete"""
+        return next(self.rows, "")
+
+
+class ReviewEngine(ExportEngine):
+    """Stands in for SzEngine, also looking up the features of entities for the feature review"""
+
+    def __init__(self, rows: list[str]) -> None:
+        super().__init__(rows)
+        self.lock = threading.Lock()
+        self.lookups: list[int] = []
+
+    def get_entity_by_entity_id(self, entity_id: int, *args: Any) -> str:
+        """An entity with a name feature for each of its records"""
+        with self.lock:
+            self.lookups.append(entity_id)
+        return json.dumps({"RESOLVED_ENTITY": {"FEATURES": {"NAME": [{}] * (entity_id % 3 + 1)}}})
+
+
+def test_orphans_sampled(sz_snapshot: ModuleType, tmp_path: Path) -> None:
+    """Entities without records are counted, with a sample of them once there are more than the sample size"""
+    writer = sz_snapshot.SnapshotWriter(sample_size=3, stats_file_name=str(tmp_path / "snapshot.json"))
+    for entity_id in range(1, 101):
+        writer.run(("ORPHAN", entity_id))
+
+    orphans = writer.stat_pack["ORPHANS"]
+    assert orphans["COUNT"] == 100
+    assert len(orphans["SAMPLE"]) == 3
+    assert set(orphans["SAMPLE"]) <= set(range(1, 101))
+
+
+@needs_fork
+def test_incremental_snapshot(sz_snapshot: ModuleType, snapshot_kwargs: Any, tmp_path: Path) -> None:
+    """
+    Updating a prior snapshot with the changed entities has the same stats and audit rows as a new snapshot. A csv
+    file left at the output by an earlier snapshot is replaced
+    """
+    prior = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "prior")
+    with open(prior["stats_file_name"], "r", encoding="utf-8") as stats_file:
+        prior_stats = json.load(stats_file)
+    prior_stats["PROCESS"]["STATUS"] = "Complete"
+    sz_snapshot.write_json_file(prior["stats_file_name"], prior_stats)
+
+    # A record moves from entity 4 to 5, entity 8 is merged into 9 and 20 is related to 40
+    db = sqlite3.connect(tmp_path / "G2C.db")
+    db.execute(
+        "update RES_ENT_OKEY set RES_ENT_ID = 5 "
+        "where OBS_ENT_ID = (select min(OBS_ENT_ID) from RES_ENT_OKEY where RES_ENT_ID = 4)"
+    )
+    db.execute("update RES_ENT_OKEY set RES_ENT_ID = 9 where RES_ENT_ID = 8")
+    db.execute("delete from RES_ENT where RES_ENT_ID = 8")
+    add_relationship(db, 20, 40, 1000)
+    db.commit()
+    db.close()
+    changed_file = tmp_path / "changed.txt"
+    changed_file.write_text("4\n5\n8\n9\n20\n40\n", encoding="utf-8")
+
+    fresh = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "fresh")
+
+    incremental_root = tmp_path / "incremental"
+    Path(f"{incremental_root}.csv").write_text("rows of an earlier snapshot\n", encoding="utf-8")
+    incremental = dict(
+        snapshot_kwargs,
+        stats_file_name=f"{incremental_root}.json",
+        csv_file_name=f"{incremental_root}.csv",
+        stat_pack=sz_snapshot.load_prior_snapshot(prior["stats_file_name"], prior["csv_file_name"]),
+        proc_start_time=time.time(),
+        prior_csv_file_name=prior["csv_file_name"],
+        changed_entity_ids=sz_snapshot.read_changed_entities([str(changed_file)]),
+    )
+    sz_snapshot.incremental_snapshot(sz_snapshot.SzDatabase(incremental["sz_db_uri"]), incremental)
+
+    assert comparable_stats(incremental["stats_file_name"]) == comparable_stats(fresh["stats_file_name"])
+    rows = read_audit_rows(sz_snapshot, incremental["csv_file_name"])
+    assert rows == read_audit_rows(sz_snapshot, fresh["csv_file_name"])
+    assert next(sz_snapshot.read_audit_rows(incremental["csv_file_name"])) == sz_snapshot.CSV_HEADERS
+
+
+@needs_fork
+def test_sdk_snapshot(
+    sz_snapshot: ModuleType, snapshot_kwargs: Any, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    A snapshot of the export of a repository has the same stats and audit rows as a database snapshot, apart from the
+    entities without records which aren't exported
+    """
+    database = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "database")
+    # Small blocks so the rows of entities are split across the blocks fetched and sent to the readers
+    monkeypatch.setattr(sz_snapshot, "SDK_FETCH_SIZE", 10)
+    monkeypatch.setattr(sz_snapshot, "SDK_BATCH_SIZE", 7)
+    sdk = dict(
+        snapshot_kwargs,
+        stats_file_name=str(tmp_path / "sdk.json"),
+        csv_file_name=str(tmp_path / "sdk.csv"),
+        stat_pack={},
+        proc_start_time=time.time(),
+    )
+    sz_snapshot.sdk_snapshot(ExportEngine(export_rows(tmp_path / "G2C.db")), sdk)
+
+    sdk_stats = comparable_stats(sdk["stats_file_name"])
+    database_stats = comparable_stats(database["stats_file_name"])
+    assert database_stats.pop("ORPHANS")["COUNT"] > 0
+    sdk_stats.pop("ORPHANS", None)
+    assert sdk_stats == database_stats
+    assert read_audit_rows(sz_snapshot, sdk["csv_file_name"]) == read_audit_rows(sz_snapshot, database["csv_file_name"])
+
+
+@needs_fork
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"audit_format": "csv", "range_size": 0},
+        {"audit_format": "gzip", "range_size": 10},
+        {"audit_format": "parquet", "range_size": 0},
+    ],
+    ids=["csv", "gzip_range_scan", "parquet"],
+)
+def test_snapshot_resume(
+    sz_snapshot: ModuleType, snapshot_kwargs: Any, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, settings: Any
+) -> None:
+    """A snapshot stopped part way through a chunk picks up from its last checkpoint with the same stats and rows"""
+    if settings["audit_format"] == "parquet":
+        pytest.importorskip("pyarrow")
+    snapshot_kwargs = dict(snapshot_kwargs, chunk_size=30, **settings)
+    clean = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "clean")
+
+    # A reader process ends while the second chunk is being read
+    reader_run = sz_snapshot.SnapshotReader.run
+
+    def stop_reader(reader: Any, queue_data: Any) -> Any:
+        if queue_data[0] == "RESUMES" and 45 in queue_data[1] or queue_data[0] == "RESUME_RANGE" and queue_data[1] > 40:
+            os._exit(1)
+        return reader_run(reader, queue_data)
+
+    with monkeypatch.context() as stopping:
+        stopping.setattr(sz_snapshot.SnapshotReader, "run", stop_reader)
+        with pytest.raises(SystemExit):
+            take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "resumed")
+    stats_file_name = str(tmp_path / "resumed.json")
+    csv_file_name = f"{tmp_path / 'resumed'}{sz_snapshot.AUDIT_FORMATS[settings['audit_format']]}"
+    with open(stats_file_name, "r", encoding="utf-8") as stats_file:
+        assert json.load(stats_file)["PROCESS"]["LAST_ENTITY_ID"] == 29
+
+    monkeypatch.setattr("builtins.input", lambda _: "y")
+    stat_pack, abort = sz_snapshot.check_stat_pack(
+        stats_file_name, csv_file_name, argparse.Namespace(quiet=False, force_sdk=False, prior_snapshot=None)
+    )
+    assert not abort
+    kwargs = dict(
+        snapshot_kwargs,
+        stats_file_name=stats_file_name,
+        csv_file_name=csv_file_name,
+        stat_pack=stat_pack,
+        proc_start_time=time.time(),
+    )
+    sz_snapshot.database_snapshot(sz_snapshot.SzDatabase(kwargs["sz_db_uri"]), kwargs)
+
+    assert comparable_stats(stats_file_name) == comparable_stats(clean["stats_file_name"])
+    assert read_audit_rows(sz_snapshot, csv_file_name) == read_audit_rows(sz_snapshot, clean["csv_file_name"])
+
+
+@needs_fork
+@pytest.mark.parametrize("audit_format", ["gzip", "parquet"])
+def test_snapshot_audit_formats(
+    sz_snapshot: ModuleType, sz_audit: ModuleType, snapshot_kwargs: Any, tmp_path: Path, audit_format: str
+) -> None:
+    """The rows of a --for_audit file are the same in each format, sz_audit reads them as entity maps"""
+    if audit_format == "parquet":
+        pytest.importorskip("pyarrow")
+    csv_snapshot = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "csv")
+    format_snapshot = take_snapshot(sz_snapshot, dict(snapshot_kwargs, audit_format=audit_format), tmp_path / "format")
+
+    rows = read_audit_rows(sz_snapshot, format_snapshot["csv_file_name"])
+    assert rows == read_audit_rows(sz_snapshot, csv_snapshot["csv_file_name"])
+    assert sum(rows.values()) > len(SZ_CONFIG_DATA["G2_CONFIG"]["CFG_DSRC"])
+
+    csv_file_name = csv_snapshot["csv_file_name"]
+    sz_audit.audit(csv_file_name, csv_file_name, str(tmp_path / "csv_audit"), False)
+    sz_audit.audit(format_snapshot["csv_file_name"], csv_file_name, str(tmp_path / "format_audit"), False)
+    for extension in (".csv", ".json"):
+        assert (tmp_path / f"format_audit{extension}").read_text(encoding="utf-8") == (
+            tmp_path / f"csv_audit{extension}"
+        ).read_text(encoding="utf-8")
+
+
+def test_feature_review_cache(sz_snapshot: ModuleType, tmp_path: Path) -> None:
+    """Entities that haven't changed are reviewed from the cache, a changed feature count looks an entity up again"""
+    db_file = tmp_path / "G2C.db"
+    build_database(db_file)
+    cache_file_name = str(tmp_path / "review_cache.json")
+    stat_pack = {"ENTITY_SIZES": {"2": {"COUNT": 4, "SAMPLE": [1, 4, 7]}}}
+
+    def review() -> tuple[Any, Any]:
+        engine = ReviewEngine([])
+        sz_dbo = sz_snapshot.SzDatabase(f"sqlite3://na:na@{db_file}")
+        feature_review = sz_snapshot.FeatureReview(engine, sz_dbo, 3, 2, cache_file_name)
+        entity_sizes = feature_review.entity_sizes(stat_pack)
+        sz_dbo.close()
+        return entity_sizes, sorted(engine.lookups)
+
+    reviewed, lookups = review()
+    assert lookups == [1, 4, 7]
+    assert reviewed["2"]["SAMPLE"] == [{1: {"NAME": 2}}, {4: {"NAME": 2}}, {7: {"NAME": 2}}]
+
+    assert review() == (reviewed, [])
+
+    db = sqlite3.connect(db_file)
+    db.execute("insert into RES_FEAT_EKEY values (4, 1000, 1, 'N')")
+    db.commit()
+    db.close()
+    assert review() == (reviewed, [4])
+
+
+@needs_fork
+@pytest.mark.parametrize("snapshot", ["database", "sdk", "incremental"])
+def test_feature_review_overlap(sz_snapshot: ModuleType, snapshot_kwargs: Any, tmp_path: Path, snapshot: str) -> None:
+    """
+    The samples are reviewed at each checkpoint while the snapshot continues, including the samples replaced once a
+    size has a full set, so none are left to start once it's done
+    """
+    snapshot_kwargs = dict(snapshot_kwargs, sample_size=3, chunk_size=20)
+    engine = ReviewEngine(export_rows(tmp_path / "G2C.db"))
+    sz_dbo = sz_snapshot.SzDatabase(snapshot_kwargs["sz_db_uri"])
+    feature_review = sz_snapshot.FeatureReview(engine, sz_dbo, 3, 2)
+    kwargs = dict(
+        snapshot_kwargs,
+        stats_file_name=str(tmp_path / "snapshot.json"),
+        csv_file_name=str(tmp_path / "snapshot.csv"),
+        stat_pack={},
+        proc_start_time=time.time(),
+    )
+    if snapshot == "database":
+        sz_snapshot.database_snapshot(sz_dbo, kwargs, feature_review)
+    elif snapshot == "sdk":
+        sz_snapshot.sdk_snapshot(engine, kwargs, feature_review)
+    else:
+        prior = take_snapshot(sz_snapshot, snapshot_kwargs, tmp_path / "prior")
+        with open(prior["stats_file_name"], "r", encoding="utf-8") as stats_file:
+            prior_stats = json.load(stats_file)
+        prior_stats["PROCESS"]["STATUS"] = "Complete"
+        sz_snapshot.write_json_file(prior["stats_file_name"], prior_stats)
+        kwargs.update(
+            stat_pack=sz_snapshot.load_prior_snapshot(prior["stats_file_name"], prior["csv_file_name"]),
+            prior_csv_file_name=prior["csv_file_name"],
+            changed_entity_ids={4, 5, 20, 40},
+        )
+        sz_snapshot.incremental_snapshot(sz_dbo, kwargs, feature_review)
+
+    with open(kwargs["stats_file_name"], "r", encoding="utf-8") as stats_file:
+        stat_pack = json.load(stats_file)
+    assert all(len(size_stats["SAMPLE"]) == 3 for size_stats in stat_pack["ENTITY_SIZES"].values())
+    sampled = {
+        str(entity_id) for size_stats in stat_pack["ENTITY_SIZES"].values() for entity_id in size_stats["SAMPLE"]
+    }
+    reviewed = set(feature_review.reviews)
+    assert sampled <= reviewed
+
+    entity_sizes = feature_review.entity_sizes(stat_pack)
+    assert set(feature_review.reviews) == reviewed
+    assert all(
+        features
+        for size_stats in entity_sizes.values()
+        for sample in size_stats["SAMPLE"]
+        for features in sample.values()
+    )
+    sz_dbo.close()